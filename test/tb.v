@@ -17,11 +17,27 @@ module tb ();
   reg clk;
   reg rst_n;
   reg ena;
-  reg [7:0] ui_in;
+  reg [7:0] ui_in_drv;   // driven by cocotb
+  reg sclk = 1'b0;        // generated below, OR-ed into ui_in[0]
+  wire [7:0] ui_in = {ui_in_drv[7:1], ui_in_drv[0] | sclk};
   reg [7:0] uio_in;
   wire [7:0] uo_out;
   wire [7:0] uio_out;
   wire [7:0] uio_oe;
+
+  // Single-bit view of uo_out[0] so cocotb can trigger on its edges:
+  wire uo_out_0 = uo_out[0];
+
+  // SPI clock for the cocotb SPI driver: while nCS (ui_in_drv[2]) is low,
+  // run SCLK at 100 kHz, each period starting with a 5 us low half.
+  // SCLK only rises while nCS is still low, so it always idles low.
+  always begin
+    wait (ui_in_drv[2] === 1'b0);
+    #5000;
+    if (ui_in_drv[2] === 1'b0) sclk = 1'b1;
+    #5000 sclk = 1'b0;
+  end
+
 `ifdef GL_TEST
   wire VPWR = 1'b1;
   wire VGND = 1'b0;